@@ -5,18 +5,26 @@
 根据品牌价值理解与声誉安全框架分析AI回答
 """
 
+import asyncio
 import csv
 import json
 import os
+import random
+import re
+import time
+from collections import Counter
 from datetime import datetime
-from openai import OpenAI
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import glob
-import time
 from json_repair import repair_json
 from dotenv import load_dotenv
-import tkinter as tk
-from tkinter import filedialog
+from cache import cache_get, cache_put, make_cache_key
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # ==================== 加载环境变量 ====================
 load_dotenv()  # 从.env文件加载环境变量
@@ -25,12 +33,76 @@ load_dotenv()  # 从.env文件加载环境变量
 API_BASE_URL = os.environ.get("API_BASE_URL", "https://api.tu-zi.com/v1")
 MODEL_NAME = os.environ.get("MODEL_NAME", "claude-sonnet-4-5-20250929")
 API_KEY = os.environ.get("API_KEY", "")  # 从.env文件读取API密钥
+try:
+    # 同时进行的分析请求数：未填写时为8，至少为1（为0时信号量永远无法获取）
+    CONCURRENCY = max(1, int(os.environ.get("CONCURRENCY") or 8))
+except ValueError:
+    print(f"⚠️  CONCURRENCY配置无效: {os.environ.get('CONCURRENCY')!r}，使用默认值8")
+    CONCURRENCY = 8
+RETRY_MAX_DELAY = 30.0  # 重试等待的最长时间（秒）
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}  # 请求本身有误，重试也不会成功的HTTP状态码
+API_TIMEOUT = 60.0  # 单次API请求超时（秒），连接卡住时尽快失败并进入重试
+STREAM_JSON_CHECK_CHARS = 200  # 流式接收到这么多字符后仍没有出现 {，则提前中止并重试
+NO_CACHE = os.environ.get("NO_CACHE") == "1"  # 设为1时忽略已缓存的分析结果，强制重新调用API（新结果仍会写入缓存）
+# 提示词/结果处理方式版本：修改提示词模板或结果解析逻辑时递增，使旧缓存自动失效
+PROMPT_VERSION = 1
+# 缓存键命名空间：模型、接口地址或提示词版本任一变化时，缓存键随之变化
+CACHE_NAMESPACE = f"{MODEL_NAME}|{API_BASE_URL}|v{PROMPT_VERSION}"
 
 # ==================== 初始化客户端 ====================
-client = OpenAI(
-    base_url=API_BASE_URL,
-    api_key=API_KEY
-)
+@lru_cache(maxsize=1)
+def get_client():
+    """
+    返回共用的异步客户端（首次调用时才导入openai并创建，菜单、选择文件等操作无需等待）
+    整个运行期间共用一个实例（及其连接池），多条数据可以并发等待网络响应
+    重试由analyze_single_response统一处理，关闭SDK内部的自动重试，避免重试次数叠加
+    """
+    from openai import AsyncOpenAI
+    
+    return AsyncOpenAI(
+        base_url=API_BASE_URL,
+        api_key=API_KEY,
+        timeout=API_TIMEOUT,
+        max_retries=0
+    )
+
+# ==================== JSON读写 ====================
+def loads_json(text):
+    """解析JSON文本（安装了orjson时使用orjson；解析失败均抛出json.JSONDecodeError）"""
+    if HAS_ORJSON:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def read_json_file(file_path: str):
+    """读取JSON文件（安装了orjson时使用orjson解析）"""
+    with open(file_path, 'rb') as f:
+        return loads_json(f.read())
+
+def write_json_file(data, file_path: str):
+    """
+    以UTF-8、2空格缩进写入JSON文件（安装了orjson时使用orjson序列化）
+    先写临时文件再替换，中断时不会留下写了一半的文件
+    """
+    if HAS_ORJSON:
+        content = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        content = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def dumps_json_line(data) -> str:
+    """序列化为单行JSON文本（含换行符），用于JSONL文件"""
+    if HAS_ORJSON:
+        return orjson.dumps(data).decode('utf-8') + "\n"
+    return json.dumps(data, ensure_ascii=False) + "\n"
 
 # ==================== 读取分析框架 ====================
 def load_analysis_framework():
@@ -46,35 +118,37 @@ def load_output_framework():
         return f.read()
 
 # ==================== 构建分析提示词 ====================
-def build_analysis_prompt(analysis_framework: str, output_framework: str, 
-                          question: str, ai_response: str, platform: str) -> str:
-    """构建用于AI分析的提示词"""
-    
-    prompt = f"""你是一位品牌声誉管理和AI内容分析专家。
+# 提示词中与单条数据无关的部分：整个运行期间只拼接一次
+ANALYSIS_PROMPT_HEADER = """你是一位品牌声誉管理和AI内容分析专家。
 
 # 任务说明
 请基于以下【分析框架】，对某AI平台针对"赛力斯/问界"品牌的回答进行深度分析。
 
 # 分析框架
-{analysis_framework}
+"""
+
+ANALYSIS_PROMPT_OUTPUT_HEADER = """
 
 # 输出要求
 请严格按照以下【输出框架】生成JSON格式的分析结果：
-{output_framework}
+"""
+
+ANALYSIS_PROMPT_DATA_HEADER = """
 
 # 待分析数据
-- **平台**: {platform}
-- **用户提问**: {question}
-- **AI回答**: 
-{ai_response}
+"""
 
+# 输出格式要求（在"Platform"处插入平台名称）
+ANALYSIS_PROMPT_FORMAT_HEAD = """
 # 输出格式要求（非常重要！）
 请直接输出一个**严格标准**的JSON对象，不要添加任何其他文字、注释或说明。
 
 JSON格式如下（请确保所有引号、逗号、括号完全匹配）：
 
-{{
-  "Platform": "{platform}",
+{
+  "Platform": \""""
+
+ANALYSIS_PROMPT_FORMAT_TAIL = """",
   "User_Query": "用户提问原文",
   "AI_Response": "AI回答原文",
   "Security_Status": "🔴高危 / 🟡预警 / 🟢安全 (必须三选一)",
@@ -83,7 +157,7 @@ JSON格式如下（请确保所有引号、逗号、括号完全匹配）：
   "Brand_Impression": "品牌印象评分（1-5分）及简评（是否有品格感、关怀度、温度）",
   "Comp_Position": "🏆优势 / 🛡️均势 / 📉劣势 (必须三选一)",
   "Strategy_Action": "详细的行动建议和优化策略（300字左右，体现专业的品牌管理能力）"
-}}
+}
 
 关键要求：
 1. 分析犀利、客观、深入，基于5C+1S框架进行全方位评估
@@ -93,124 +167,246 @@ JSON格式如下（请确保所有引号、逗号、括号完全匹配）：
 5. **所有字符串值内如有引号请用中文引号「」或转义**
 6. **确保JSON格式完全正确，可以被标准JSON解析器解析**
 """
+
+def build_prompt_prefix(analysis_framework: str, output_framework: str) -> str:
+    """拼接提示词的固定前缀（角色、分析框架、输出框架），每次运行只需调用一次"""
     
-    return prompt
+    return "".join((
+        ANALYSIS_PROMPT_HEADER, analysis_framework,
+        ANALYSIS_PROMPT_OUTPUT_HEADER, output_framework,
+        ANALYSIS_PROMPT_DATA_HEADER
+    ))
+
+def build_analysis_prompt(prompt_prefix: str, question: str, ai_response: str, platform: str) -> str:
+    """在固定前缀后拼接单条待分析数据，构建用于AI分析的提示词"""
+    
+    return "".join((
+        prompt_prefix,
+        "- **平台**: ", platform,
+        "\n- **用户提问**: ", question,
+        "\n- **AI回答**: \n", ai_response,
+        "\n", ANALYSIS_PROMPT_FORMAT_HEAD, platform, ANALYSIS_PROMPT_FORMAT_TAIL
+    ))
 
 # ==================== 智能JSON提取与修复 ====================
+JSON_SCAN_PATTERN = re.compile(r'["\\{}]')  # 扫描对象边界时只关心引号、反斜杠和花括号
+REQUIRED_FIELD_ORDER = ('Platform', 'User_Query', 'AI_Response', 'Security_Status')
+REQUIRED_FIELDS = frozenset(REQUIRED_FIELD_ORDER)  # 分析结果必须包含的字段
+
+def find_balanced_object(text: str, start: int = 0) -> Optional[str]:
+    """
+    从start之后的第一个 { 开始扫描（跳过字符串内的括号和转义字符），返回第一个括号配平的完整对象
+    没有找到完整对象（如回复被截断）时返回None
+    """
+    
+    start = text.find('{', start)
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped_pos = -1  # 被反斜杠转义的字符位置
+    for match in JSON_SCAN_PATTERN.finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped_pos = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+def scan_result_object(text: str, start: int = 0) -> Tuple[Optional[Dict], int]:
+    """
+    从start开始依次查找配平的对象，返回第一个可以解析且包含全部必要字段的分析结果
+    说明文字中的示例括号（如"示例 {x}"）会被跳过；返回 (分析结果或None, 下次继续查找的位置)
+    """
+    
+    while True:
+        obj_start = text.find('{', start)
+        if obj_start == -1:
+            return None, len(text)
+        candidate = find_balanced_object(text, obj_start)
+        if candidate is None:
+            return None, obj_start  # 对象尚不完整（流式接收中或已被截断）
+        try:
+            result = loads_json(candidate)
+        except ValueError:
+            result = None
+        if isinstance(result, dict) and REQUIRED_FIELDS <= result.keys():
+            return result, obj_start
+        start = obj_start + len(candidate)
+
+def _fenced_block(text: str, marker: str) -> Optional[str]:
+    """取出第一个marker之后、下一个```之前的内容（没有marker时返回None）"""
+    
+    start = text.find(marker)
+    if start == -1:
+        return None
+    start += len(marker)
+    end = text.find("```", start)
+    return text[start:end if end != -1 else len(text)].strip()
+
 def extract_and_parse_json(text: str) -> Dict:
     """智能提取并解析JSON，支持多种格式和自动修复"""
     
-    # 策略1: 尝试直接解析
+    # 快速路径：原文，或前后带有说明文字/代码块标记的完整分析结果对象
     try:
         return json.loads(text)
-    except:
+    except json.JSONDecodeError:
         pass
+    result, _ = scan_result_object(text)
+    if result is not None:
+        return result
+    
+    # 按优先级收集候选文本：原文、```json代码块、```代码块、第一个 { 到最后一个 } 之间的内容
+    candidates = [text, _fenced_block(text, "```json"), _fenced_block(text, "```")]
+    first_brace = text.find('{')
+    last_brace = text.rfind('}')
+    if first_brace != -1 and last_brace != -1:
+        candidates.append(text[first_brace:last_brace+1])
+    candidates = [c for c in dict.fromkeys(candidates) if c is not None]  # 去重并保持顺序
     
-    # 策略2: 提取代码块中的JSON
-    if "```json" in text:
+    # 策略1-3: 依次尝试直接解析（原文已在快速路径中尝试过）
+    for candidate in candidates:
+        if candidate == text:
+            continue
         try:
-            json_text = text.split("```json")[1].split("```")[0].strip()
-            return json.loads(json_text)
-        except:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
             pass
     
-    if "```" in text:
+    # 策略4: 使用 json-repair 修复损坏的JSON（直接返回对象，不再重复解析）
+    for candidate in candidates:
         try:
-            json_text = text.split("```")[1].split("```")[0].strip()
-            return json.loads(json_text)
-        except:
-            pass
+            result = repair_json(candidate, return_objects=True, skip_json_loads=True)
+        except Exception:
+            continue
+        if isinstance(result, dict):  # 无法修复时json-repair返回空字符串
+            print("✓ JSON已自动修复")
+            return result
     
-    # 策略3: 查找第一个 { 到最后一个 } 之间的内容
-    try:
-        first_brace = text.find('{')
-        last_brace = text.rfind('}')
-        if first_brace != -1 and last_brace != -1:
-            json_text = text[first_brace:last_brace+1]
-            return json.loads(json_text)
-    except:
-        pass
+    # 所有策略都失败
+    raise ValueError("无法提取或修复JSON")
+
+# ==================== 流式调用API ====================
+async def stream_completion_text(prompt: str) -> str:
+    """
+    以流式方式调用API并拼接回复
+    回复中已出现可以解析且包含必要字段的JSON对象时立即停止接收（说明文字中的示例括号不算）；
+    开头一段仍没有出现 { 时提前中止，以便尽快重试
+    """
+    
+    stream = await get_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=4000,
+        stream=True
+    )
     
-    # 策略4: 使用 json-repair 修复损坏的JSON
+    chunks = []
+    received = 0
+    brace_seen = False
+    scan_from = 0  # 之前的文本中已确认没有完整的分析结果对象
     try:
-        # 先尝试提取可能的JSON部分
-        json_candidates = [text]
-        
-        if "```json" in text:
-            json_candidates.append(text.split("```json")[1].split("```")[0].strip())
-        
-        if "```" in text:
-            json_candidates.append(text.split("```")[1].split("```")[0].strip())
-        
-        first_brace = text.find('{')
-        last_brace = text.rfind('}')
-        if first_brace != -1 and last_brace != -1:
-            json_candidates.append(text[first_brace:last_brace+1])
-        
-        # 对每个候选尝试修复
-        for candidate in json_candidates:
-            try:
-                repaired = repair_json(candidate)
-                result = json.loads(repaired)
-                print("✓ JSON已自动修复")
-                return result
-            except:
+        async for chunk in stream:
+            if not (chunk.choices and chunk.choices[0].delta.content):
                 continue
-    except:
-        pass
+            content = chunk.choices[0].delta.content
+            chunks.append(content)
+            received += len(content)
+            
+            if not brace_seen:
+                brace_seen = '{' in content
+                if not brace_seen and received >= STREAM_JSON_CHECK_CHARS:
+                    raise ValueError(f"响应开头没有JSON: {''.join(chunks)[:30]}")
+            
+            # 只在收到 } 时检查分析结果对象是否已经完整
+            if brace_seen and '}' in content:
+                result, scan_from = scan_result_object("".join(chunks), scan_from)
+                if result is not None:
+                    break
+    finally:
+        # 提前结束时关闭底层连接，避免服务端继续生成
+        await stream.response.aclose()
     
-    # 所有策略都失败
-    raise ValueError("无法提取或修复JSON")
+    return "".join(chunks)
 
 # ==================== 调用AI进行分析（带重试机制）====================
-def analyze_single_response(question: str, ai_response: str, platform: str,
-                            analysis_framework: str, output_framework: str,
-                            max_retries: int = 3) -> Dict:
-    """对单条AI回答进行分析，支持失败重试"""
+def retry_delay(attempt: int, error: Exception) -> float:
+    """
+    计算第attempt次失败后的等待时间（秒）
+    服务端返回Retry-After时按其等待，否则指数退避并加入随机抖动，避免并发任务同时重试
+    """
+    from openai import APIStatusError
+    
+    if isinstance(error, APIStatusError):
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), RETRY_MAX_DELAY)
+            except ValueError:
+                pass  # HTTP日期格式，按指数退避处理
+    return min(2 ** attempt, RETRY_MAX_DELAY) * random.uniform(0.5, 1.5)
+
+async def analyze_single_response(question: str, ai_response: str, platform: str,
+                                  prompt_prefix: str, max_retries: int = 3) -> Dict:
+    """对单条AI回答进行分析，支持失败重试；相同提示词的成功结果会被缓存，重复运行时直接复用"""
     
     print(f"\n正在分析: 平台={platform}, 问题=【{question[:50]}...】")
     
-    prompt = build_analysis_prompt(analysis_framework, output_framework, 
-                                   question, ai_response, platform)
+    prompt = build_analysis_prompt(prompt_prefix, question, ai_response, platform)
+    
+    # 相同模型/接口/提示词版本和提示词（即相同框架与数据）之前已成功分析过时，直接返回缓存结果
+    cache_key = make_cache_key(CACHE_NAMESPACE, prompt)
+    cached = None if NO_CACHE else cache_get(cache_key)
+    if cached is not None:
+        print(f"✓ 命中缓存: 安全状态={cached.get('Security_Status', 'N/A')}")
+        return cached
     
     # 重试机制
     for attempt in range(max_retries):
         try:
             if attempt > 0:
                 print(f"  第 {attempt + 1} 次尝试...")
-                time.sleep(2)  # 重试前等待2秒
-            
-            # 调用AI
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=4000
-            )
             
-            result_text = response.choices[0].message.content.strip()
+            # 调用AI（流式接收）
+            result_text = (await stream_completion_text(prompt)).strip()
             
             # 使用智能JSON提取与修复
             result = extract_and_parse_json(result_text)
             
             # 验证必要字段
-            required_fields = ['Platform', 'User_Query', 'AI_Response', 'Security_Status']
-            if all(field in result for field in required_fields):
+            missing = REQUIRED_FIELDS - result.keys()
+            if not missing:
                 print(f"✓ 分析完成: 安全状态={result.get('Security_Status', 'N/A')}")
+                cache_put(cache_key, result)
                 return result
             else:
-                missing = [f for f in required_fields if f not in result]
-                raise ValueError(f"缺少必要字段: {missing}")
+                raise ValueError(f"缺少必要字段: {[f for f in REQUIRED_FIELD_ORDER if f in missing]}")
         
         except Exception as e:
             error_msg = str(e)
             print(f"✗ 尝试 {attempt + 1} 失败: {error_msg}")
             
-            # 如果是最后一次尝试，返回错误结果
-            if attempt == max_retries - 1:
-                print(f"✗ 已达到最大重试次数，分析失败")
+            # 如果是最后一次尝试，或请求本身有误（重试也不会成功），返回错误结果
+            from openai import APIStatusError
+            retryable = not (isinstance(e, APIStatusError) and e.status_code in NON_RETRYABLE_STATUS)
+            if attempt == max_retries - 1 or not retryable:
+                print(f"✗ 已达到最大重试次数，分析失败" if retryable else f"✗ 请求无法重试，分析失败")
                 if 'result_text' in locals():
                     print(f"原始回复前500字符: {result_text[:500]}...")
                 
@@ -219,12 +415,14 @@ def analyze_single_response(question: str, ai_response: str, platform: str,
                     "User_Query": question,
                     "AI_Response": ai_response,
                     "Security_Status": "⚠️ 分析失败",
-                    "Risk_Diagnosis": f"解析错误（已重试{max_retries}次）: {error_msg}",
+                    "Risk_Diagnosis": f"解析错误（已重试{attempt + 1}次）: {error_msg}",
                     "Fact_Tech": "N/A",
                     "Brand_Impression": "N/A",
                     "Comp_Position": "N/A",
                     "Strategy_Action": "需要手动检查原始回复"
                 }
+            
+            await asyncio.sleep(retry_delay(attempt, e))
     
     # 理论上不会到这里，但以防万一
     return {
@@ -241,23 +439,43 @@ def analyze_single_response(question: str, ai_response: str, platform: str,
 
 # ==================== 断点续传功能 ====================
 PROGRESS_FILE = ".analysis_progress.json"
+PROGRESS_RESULTS_FILE = ".analysis_progress_results.jsonl"  # 已完成的分析结果，每行一条，只追加
+PROGRESS_SAVE_EVERY = 5  # 每提交多少条数据保存一次进度
+PROGRESS_SAVE_INTERVAL = 2.0  # 距上次保存超过多少秒时也保存进度
+PROGRESS_FSYNC_EVERY = 20  # 每保存多少次进度将结果文件同步到磁盘一次
+
+def csv_fingerprint(csv_path: str) -> Dict:
+    """CSV文件的大小和修改时间，用于恢复时确认源文件没有变化"""
+    st = os.stat(csv_path)
+    return {"csv_size": st.st_size, "csv_mtime_ns": st.st_mtime_ns}
 
-def save_progress(csv_path: str, total: int, processed: int, results: List[Dict], 
-                  start_time: str, rows_data: List[Dict]):
-    """保存处理进度"""
+def save_progress(csv_path: str, fingerprint: Dict, total: int, processed: int, start_time: str,
+                  new_results: List[Dict], result_count: int, results_file, sync: bool = False):
+    """
+    保存处理进度：新完成的结果追加到已打开的结果文件results_file（PROGRESS_RESULTS_FILE），
+    进度文件只记录源CSV和计数（不再保存整份CSV和全部结果），以原子替换的方式写入
+    fingerprint为读取CSV时记录的csv_fingerprint，运行中CSV被修改时恢复进度会因指纹不符而放弃
+    sync为True时同时将结果文件同步到磁盘
+    """
+    if new_results:
+        results_file.write("".join(map(dumps_json_line, new_results)))
+    # 先确保结果已写出，再更新进度文件中的result_count
+    results_file.flush()
+    if sync:
+        os.fsync(results_file.fileno())
+    
     progress_data = {
         "csv_file": csv_path,
         "csv_file_abs": os.path.abspath(csv_path),
+        **fingerprint,
         "start_time": start_time,
         "total": total,
         "processed": processed,
-        "results": results,
-        "rows_data": rows_data,  # 保存所有行数据，以便恢复
+        "result_count": result_count,  # 结果文件中有效的行数
         "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     
-    with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(progress_data, f, ensure_ascii=False, indent=2)
+    write_json_file(progress_data, PROGRESS_FILE)
 
 def load_progress() -> Optional[Dict]:
     """加载未完成的进度"""
@@ -265,16 +483,65 @@ def load_progress() -> Optional[Dict]:
         return None
     
     try:
-        with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json_file(PROGRESS_FILE)
     except Exception as e:
         print(f"⚠️  无法加载进度文件: {e}")
         return None
 
+def load_progress_results(progress: Dict) -> List[Dict]:
+    """读取断点前已完成的分析结果（兼容旧版把结果直接存在进度文件中的格式）"""
+    result_count = progress.get("result_count", 0)
+    results = progress.get("results", [])
+    if "results" not in progress and result_count and os.path.exists(PROGRESS_RESULTS_FILE):
+        with open(PROGRESS_RESULTS_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                if len(results) >= result_count:
+                    break  # 进度文件之后追加的行属于未确认的写入，丢弃
+                try:
+                    results.append(loads_json(line))
+                except ValueError:
+                    # 异常退出时未同步到磁盘的行可能残缺，只保留之前的结果，调用方会从实际恢复的位置继续
+                    print(f"⚠️  结果文件第 {len(results) + 1} 行已损坏，之后的结果将重新分析")
+                    break
+    
+    # 重写结果文件（去掉未确认的行），之后继续追加
+    with open(PROGRESS_RESULTS_FILE, 'w', encoding='utf-8') as f:
+        f.write("".join(map(dumps_json_line, results)))
+    return results
+
+def resume_index(rows: List[Dict], result_count: int) -> int:
+    """
+    已恢复result_count条结果时，应从第几行继续处理
+    （跳过的空数据不产生结果，因此取第result_count条有效数据的下一行）
+    """
+    if result_count <= 0:
+        return 0
+    done = 0
+    for idx, row in enumerate(rows):
+        if row.get('问题', '') and row.get('回答', ''):
+            done += 1
+            if done == result_count:
+                return idx + 1
+    return len(rows)
+
+@lru_cache(maxsize=8)
+def _read_csv_rows(csv_path: str, mtime_ns: int) -> Tuple[Dict, ...]:
+    """解析CSV文件；以(路径, 修改时间)为缓存键，选择文件时统计行数与正式分析只解析一次"""
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        return tuple(csv.DictReader(f))
+
+def read_csv_rows(csv_path: str) -> List[Dict]:
+    """读取CSV文件的所有数据行"""
+    return list(_read_csv_rows(csv_path, os.stat(csv_path).st_mtime_ns))
+
 def clear_progress():
     """清除进度文件"""
-    if os.path.exists(PROGRESS_FILE):
-        os.remove(PROGRESS_FILE)
+    cleared = False
+    for path in (PROGRESS_FILE, PROGRESS_RESULTS_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+            cleared = True
+    if cleared:
         print("✓ 进度文件已清除")
 
 def check_unfinished_task() -> Optional[Dict]:
@@ -291,6 +558,13 @@ def check_unfinished_task() -> Optional[Dict]:
         clear_progress()
         return None
     
+    # 检查CSV文件是否被修改过（旧版进度文件自带行数据，无需检查）
+    if "rows_data" not in progress and "csv_size" in progress:
+        if csv_fingerprint(csv_file) != {"csv_size": progress["csv_size"], "csv_mtime_ns": progress.get("csv_mtime_ns")}:
+            print(f"⚠️  原CSV文件 {csv_file} 已被修改，忽略进度")
+            clear_progress()
+            return None
+    
     # 检查是否已完成
     if progress.get('processed', 0) >= progress.get('total', 0):
         print("⚠️  进度文件显示任务已完成，将清除进度")
@@ -299,6 +573,98 @@ def check_unfinished_task() -> Optional[Dict]:
     
     return progress
 
+# ==================== 并发分析 ====================
+async def analyze_rows_concurrently(csv_path: str, fingerprint: Dict, rows: List[Dict], start_idx: int, total: int,
+                                    results: List[Dict], start_time: str,
+                                    prompt_prefix: str):
+    """
+    并发分析rows[start_idx:]（最多CONCURRENCY条同时进行），结果按原顺序追加到results
+    只有前面的数据全部完成后才推进已处理条数并保存进度，保证断点续传时不遗漏数据
+    """
+    
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    inflight = {}  # (问题, 回答, 平台) -> 分析任务，重复的数据只调用一次API
+    
+    async def analyze_once(current_idx: int, question: str, ai_response: str, platform: str) -> Dict:
+        async with semaphore:
+            print(f"\n[{current_idx}/{total}] 处理中...")
+            
+            # 调用AI分析
+            return await analyze_single_response(
+                question=question,
+                ai_response=ai_response,
+                platform=platform,
+                prompt_prefix=prompt_prefix
+            )
+    
+    async def analyze_row(idx: int):
+        row = rows[idx]
+        current_idx = idx + 1
+        
+        question = row.get('问题', '')
+        ai_response = row.get('回答', '')
+        platform = row.get('AI平台', '')
+        
+        if not question or not ai_response:
+            print(f"\n[{current_idx}/{total}] ⚠️  跳过空数据")
+            return idx, None
+        
+        key = (question, ai_response, platform)
+        if key in inflight:
+            print(f"\n[{current_idx}/{total}] 与之前的数据重复，复用分析结果")
+        else:
+            inflight[key] = asyncio.ensure_future(analyze_once(current_idx, question, ai_response, platform))
+        analysis_result = dict(await inflight[key])  # 复制一份，避免重复数据共用同一个字典
+        
+        # 添加原始数据的序号和填写人信息
+        analysis_result['序号'] = row.get('序号', current_idx)
+        analysis_result['填写人'] = row.get('填写人', '')
+        return idx, analysis_result
+    
+    tasks = [asyncio.create_task(analyze_row(idx)) for idx in range(start_idx, len(rows))]
+    finished = {}
+    next_idx = start_idx
+    unsaved = []  # 已按顺序提交、尚未写入结果文件的结果
+    saved_idx = start_idx
+    saves = 0
+    last_save_time = time.monotonic()
+    
+    def flush_progress(results_file):
+        nonlocal saved_idx, saves, last_save_time
+        saves += 1
+        save_progress(csv_path, fingerprint, total, next_idx, start_time, unsaved, len(results),
+                      results_file, sync=saves % PROGRESS_FSYNC_EVERY == 0)
+        unsaved.clear()
+        saved_idx = next_idx
+        last_save_time = time.monotonic()
+        print(f"✓ 进度已保存 ({next_idx}/{total})")
+    
+    with open(PROGRESS_RESULTS_FILE, 'a', encoding='utf-8', buffering=1 << 16) as results_file:
+        try:
+            for future in asyncio.as_completed(tasks):
+                idx, analysis_result = await future
+                finished[idx] = analysis_result
+                
+                # 按原顺序提交已连续完成的结果（跳过的空数据为None）
+                committed = []
+                while next_idx in finished:
+                    analysis_result = finished.pop(next_idx)
+                    if analysis_result is not None:
+                        committed.append(analysis_result)
+                    next_idx += 1
+                results.extend(committed)
+                unsaved.extend(committed)
+                
+                # 每完成若干条或每隔一段时间保存一次进度
+                if (next_idx - saved_idx >= PROGRESS_SAVE_EVERY
+                        or time.monotonic() - last_save_time >= PROGRESS_SAVE_INTERVAL):
+                    flush_progress(results_file)
+                print("-" * 80)
+        finally:
+            # 正常结束、中断（Ctrl+C）或出错时，都保存尚未写入的进度
+            if next_idx > saved_idx:
+                flush_progress(results_file)
+
 # ==================== 读取CSV并批量分析 ====================
 def analyze_csv_data(csv_path: str = "数据表.csv", resume_progress: Optional[Dict] = None) -> List[Dict]:
     """读取CSV数据并进行批量分析，支持断点续传
@@ -312,17 +678,29 @@ def analyze_csv_data(csv_path: str = "数据表.csv", resume_progress: Optional[
     print("正在加载分析框架...")
     analysis_framework = load_analysis_framework()
     output_framework = load_output_framework()
+    prompt_prefix = build_prompt_prefix(analysis_framework, output_framework)
     print("✓ 框架加载完成")
     
     # 判断是否从断点恢复
     if resume_progress:
         print(f"\n从断点恢复处理...")
         start_time = resume_progress.get('start_time', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        results = resume_progress.get('results', [])
-        rows = resume_progress.get('rows_data', [])
+        results = load_progress_results(resume_progress)
+        if "csv_size" in resume_progress:
+            # 沿用开始时记录的指纹（check_unfinished_task已确认CSV未被修改）
+            fingerprint = {"csv_size": resume_progress["csv_size"], "csv_mtime_ns": resume_progress.get("csv_mtime_ns")}
+        else:
+            fingerprint = csv_fingerprint(csv_path)
+        rows = resume_progress.get('rows_data') or read_csv_rows(csv_path)
         start_idx = resume_progress.get('processed', 0)
         total = len(rows)
         
+        # 结果文件比进度记录的少（如两次同步之间异常退出丢失了末尾的写入）时，从实际恢复的位置重新处理
+        expected_count = resume_progress.get('result_count', len(results))
+        if len(results) < expected_count:
+            start_idx = min(start_idx, resume_index(rows, len(results)))
+            print(f"⚠️  结果文件只恢复了 {len(results)}/{expected_count} 条结果，将从第 {start_idx + 1} 条重新处理")
+        
         print(f"✓ 已完成 {start_idx}/{total} 条")
         print(f"✓ 将从第 {start_idx + 1} 条开始继续处理\n")
     else:
@@ -332,52 +710,20 @@ def analyze_csv_data(csv_path: str = "数据表.csv", resume_progress: Optional[
         start_idx = 0
         start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-            total = len(rows)
+        clear_progress()  # 清除上一次任务残留的结果文件
+        fingerprint = csv_fingerprint(csv_path)  # 在读取之前记录，之后的修改会使断点进度失效
+        rows = read_csv_rows(csv_path)
+        total = len(rows)
         
         print(f"✓ 共找到 {total} 条数据\n")
     
     print("=" * 80)
     
     try:
-        for idx in range(start_idx, len(rows)):
-            row = rows[idx]
-            current_idx = idx + 1
-            
-            print(f"\n[{current_idx}/{total}] 处理中...")
-            
-            question = row.get('问题', '')
-            ai_response = row.get('回答', '')
-            platform = row.get('AI平台', '')
-            
-            if not question or not ai_response:
-                print("⚠️  跳过空数据")
-                # 即使跳过也要保存进度
-                save_progress(csv_path, total, current_idx, results, start_time, rows)
-                continue
-            
-            # 调用AI分析
-            analysis_result = analyze_single_response(
-                question=question,
-                ai_response=ai_response,
-                platform=platform,
-                analysis_framework=analysis_framework,
-                output_framework=output_framework
-            )
-            
-            # 添加原始数据的序号和填写人信息
-            analysis_result['序号'] = row.get('序号', current_idx)
-            analysis_result['填写人'] = row.get('填写人', '')
-            
-            results.append(analysis_result)
-            
-            # 每处理完一条就保存进度
-            save_progress(csv_path, total, current_idx, results, start_time, rows)
-            print(f"✓ 进度已保存 ({current_idx}/{total})")
-            
-            print("-" * 80)
+        asyncio.run(analyze_rows_concurrently(
+            csv_path, fingerprint, rows, start_idx, total, results, start_time,
+            prompt_prefix
+        ))
         
         # 全部完成后清除进度文件
         clear_progress()
@@ -410,6 +756,10 @@ def select_csv_file() -> Optional[str]:
     print("\n正在打开文件选择对话框...")
     
     try:
+        # 只有选择文件时才需要图形界面，在此处导入（未安装tkinter时回退到命令行模式）
+        import tkinter as tk
+        from tkinter import filedialog
+        
         # 创建一个隐藏的Tkinter根窗口
         root = tk.Tk()
         root.withdraw()  # 隐藏主窗口
@@ -437,10 +787,8 @@ def select_csv_file() -> Optional[str]:
             # 显示文件信息
             try:
                 file_size = os.path.getsize(file_path)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    row_count = sum(1 for row in reader) - 1  # 减去表头
-                    
+                row_count = len(read_csv_rows(file_path))
+                
                 print(f"   数据行数: {row_count} 行 | 大小: {file_size/1024:.1f} KB")
             except Exception as e:
                 print(f"   (无法读取文件信息: {e})")
@@ -467,10 +815,8 @@ def select_csv_file() -> Optional[str]:
             file_size = os.path.getsize(filepath)
             
             try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    row_count = sum(1 for row in reader) - 1
-                    
+                row_count = len(read_csv_rows(filepath))
+                
                 print(f"{idx}. {filepath}")
                 print(f"   数据行数: {row_count} 行 | 大小: {file_size/1024:.1f} KB")
                 print()
@@ -503,57 +849,86 @@ def list_analysis_results(output_dir: str = "analysis_results") -> List[str]:
     if not os.path.exists(output_dir):
         return []
     
-    pattern = os.path.join(output_dir, "ai_reputation_analysis_*.json")
-    files = glob.glob(pattern)
-    files.sort(reverse=True)  # 最新的在前面
+    with os.scandir(output_dir) as entries:
+        files = [entry.path for entry in entries
+                 if entry.name.startswith("ai_reputation_analysis_") and entry.name.endswith(".json")]
+    files.sort(reverse=True)  # 文件名以时间戳结尾，逆序即最新的在前面
     
     return files
 
+# ==================== 分析结果文件概要 ====================
+def load_index_stats(output_dir: str = "analysis_results") -> Dict[str, Dict]:
+    """读取索引文件（2-generate_index.py生成）中记录的各文件概要，索引不存在或无概要时返回空字典"""
+    
+    index_file = os.path.join(output_dir, "files_index.json")
+    if not os.path.exists(index_file):
+        return {}
+    
+    try:
+        return read_json_file(index_file).get("file_stats", {})
+    except Exception:
+        return {}
+
+def summarize_result_file(filepath: str, index_stats: Dict[str, Dict]) -> Tuple[int, int]:
+    """
+    返回 (数据总数, 失败条数)
+    索引中记录的大小和修改时间与文件一致时直接使用索引中的统计，否则读取文件统计
+    """
+    
+    stat = os.stat(filepath)
+    cached = index_stats.get(os.path.basename(filepath))
+    if cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+        return cached["total"], cached["failed"]
+    
+    data = read_json_file(filepath)
+    return len(data), sum(1 for item in data if item.get('Security_Status') == '⚠️ 分析失败')
+
 # ==================== 读取已有的分析结果 ====================
 def load_analysis_results(filepath: str) -> List[Dict]:
     """读取已有的分析结果JSON文件"""
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json_file(filepath)
 
 # ==================== 查找失败的分析 ====================
-def find_failed_analyses(results: List[Dict]) -> List[int]:
-    """找出所有分析失败的条目索引"""
+def scan_results(results: List[Dict]) -> Tuple[List[int], Counter]:
+    """一次遍历：返回 (分析失败的条目索引, 各安全状态的数量)"""
     
     failed_indices = []
+    security_stats = Counter()
     for idx, result in enumerate(results):
-        if result.get('Security_Status') == '⚠️ 分析失败':
+        status = result.get('Security_Status', 'Unknown')
+        security_stats[status] += 1
+        if status == '⚠️ 分析失败':
             failed_indices.append(idx)
     
-    return failed_indices
+    return failed_indices, security_stats
 
-# ==================== 重新分析失败的条目 ====================
-def reanalyze_failed_items(results: List[Dict], failed_indices: List[int],
-                           analysis_framework: str, output_framework: str) -> List[Dict]:
-    """重新分析失败的条目"""
+def find_failed_analyses(results: List[Dict]) -> List[int]:
+    """找出所有分析失败的条目索引"""
     
-    if not failed_indices:
-        print("✓ 没有发现失败的分析条目")
-        return results
+    return scan_results(results)[0]
+
+# ==================== 重新分析失败的条目 ====================
+async def reanalyze_concurrently(results: List[Dict], failed_indices: List[int], prompt_prefix: str):
+    """并发重新分析失败的条目（最多CONCURRENCY条同时进行），结果原位替换"""
     
-    print(f"\n发现 {len(failed_indices)} 条分析失败的数据，开始重新分析...")
-    print("=" * 80)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
     
-    for idx, failed_idx in enumerate(failed_indices, 1):
+    async def reanalyze_one(idx: int, failed_idx: int):
         result = results[failed_idx]
         
-        print(f"\n[{idx}/{len(failed_indices)}] 重新分析索引 {failed_idx}...")
-        print(f"平台: {result.get('Platform', 'N/A')}")
-        print(f"问题: {result.get('User_Query', '')[:50]}...")
-        
-        # 重新分析
-        new_result = analyze_single_response(
-            question=result.get('User_Query', ''),
-            ai_response=result.get('AI_Response', ''),
-            platform=result.get('Platform', ''),
-            analysis_framework=analysis_framework,
-            output_framework=output_framework
-        )
+        async with semaphore:
+            print(f"\n[{idx}/{len(failed_indices)}] 重新分析索引 {failed_idx}...")
+            print(f"平台: {result.get('Platform', 'N/A')}")
+            print(f"问题: {result.get('User_Query', '')[:50]}...")
+            
+            # 重新分析
+            new_result = await analyze_single_response(
+                question=result.get('User_Query', ''),
+                ai_response=result.get('AI_Response', ''),
+                platform=result.get('Platform', ''),
+                prompt_prefix=prompt_prefix
+            )
         
         # 保留原有的序号和填写人信息
         new_result['序号'] = result.get('序号', '')
@@ -564,6 +939,23 @@ def reanalyze_failed_items(results: List[Dict], failed_indices: List[int],
         
         print("-" * 80)
     
+    await asyncio.gather(*(reanalyze_one(idx, failed_idx)
+                           for idx, failed_idx in enumerate(failed_indices, 1)))
+
+def reanalyze_failed_items(results: List[Dict], failed_indices: List[int],
+                           analysis_framework: str, output_framework: str) -> List[Dict]:
+    """重新分析失败的条目"""
+    
+    if not failed_indices:
+        print("✓ 没有发现失败的分析条目")
+        return results
+    
+    print(f"\n发现 {len(failed_indices)} 条分析失败的数据，开始重新分析...")
+    print("=" * 80)
+    
+    prompt_prefix = build_prompt_prefix(analysis_framework, output_framework)
+    asyncio.run(reanalyze_concurrently(results, failed_indices, prompt_prefix))
+    
     return results
 
 # ==================== 保存结果 ====================
@@ -596,18 +988,14 @@ def save_results(results: List[Dict], output_dir: str = "analysis_results",
         filepath = os.path.join(output_dir, filename)
     
     # 保存JSON
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    write_json_file(results, filepath)
     
     print(f"\n{'='*80}")
     print(f"✓ 分析完成！结果已保存至: {filepath}")
     print(f"✓ 共分析 {len(results)} 条数据")
     
     # 统计安全状态
-    security_stats = {}
-    for result in results:
-        status = result.get('Security_Status', 'Unknown')
-        security_stats[status] = security_stats.get(status, 0) + 1
+    _, security_stats = scan_results(results)
     
     print(f"\n安全状态统计:")
     for status, count in security_stats.items():
@@ -660,6 +1048,8 @@ def select_json_file() -> Optional[str]:
         print("\n⚠️  未找到任何已有的分析结果文件")
         return None
     
+    index_stats = load_index_stats()
+    
     print("\n找到以下分析结果文件：")
     print("-" * 80)
     for idx, filepath in enumerate(files, 1):
@@ -668,11 +1058,8 @@ def select_json_file() -> Optional[str]:
         
         # 读取文件统计信息
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                total_count = len(data)
-                failed_count = sum(1 for item in data if item.get('Security_Status') == '⚠️ 分析失败')
-                
+            total_count, failed_count = summarize_result_file(filepath, index_stats)
+            
             print(f"{idx}. {filename}")
             print(f"   数据总数: {total_count} 条 | 失败: {failed_count} 条 | 大小: {file_size/1024:.1f} KB")
             print()
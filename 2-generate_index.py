@@ -10,6 +10,33 @@ import os
 from pathlib import Path
 from datetime import datetime
 
+FAILED_STATUS = '⚠️ 分析失败'
+
+def summarize_result_file(file_path: Path, stat: os.stat_result) -> dict:
+    """统计单个分析结果文件：大小、修改时间、数据条数、分析失败条数"""
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "total": len(data),
+        "failed": sum(1 for item in data if item.get('Security_Status') == FAILED_STATUS)
+    }
+
+def load_previous_stats(index_file: Path) -> dict:
+    """读取上一次生成的索引中的文件概要，索引不存在或无法读取时返回空字典"""
+    
+    if not index_file.exists():
+        return {}
+    
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get("file_stats", {})
+    except Exception:
+        return {}
+
 def generate_file_index():
     """生成 analysis_results 目录下所有 JSON 文件的索引"""
     
@@ -19,33 +46,53 @@ def generate_file_index():
         print(f"[ERROR] 目录不存在: {analysis_dir}")
         return
     
-    # 获取所有 JSON 文件
-    json_files = sorted(
-        [f.name for f in analysis_dir.glob('*.json') if f.name != 'files_index.json'],
-        reverse=True  # 最新的文件在前面
-    )
+    # 获取所有 JSON 文件（一次目录遍历同时取得文件状态）
+    with os.scandir(analysis_dir) as entries:
+        file_states = {
+            entry.name: entry.stat()
+            for entry in entries
+            if entry.name.endswith('.json') and entry.name != 'files_index.json' and entry.is_file()
+        }
+    json_files = sorted(file_states, reverse=True)  # 最新的文件在前面
     
     if not json_files:
         print(f"[WARNING] 在 {analysis_dir} 目录下没有找到 JSON 文件")
         return
     
+    # 统计每个文件的概要信息（供选择文件时直接显示，无需重新解析文件）
+    # 大小和修改时间与上一次索引一致的文件直接沿用原有统计，只重新解析有变化的文件
+    index_file = analysis_dir / 'files_index.json'
+    previous_stats = load_previous_stats(index_file)
+    file_stats = {}
+    updated_count = 0
+    for filename in json_files:
+        stat = file_states[filename]
+        previous = previous_stats.get(filename)
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            file_stats[filename] = previous
+            continue
+        try:
+            file_stats[filename] = summarize_result_file(analysis_dir / filename, stat)
+            updated_count += 1
+        except Exception as e:
+            print(f"[WARNING] 无法统计文件 {filename}: {e}")
+    
     # 生成索引数据
     index_data = {
         "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "total_files": len(json_files),
-        "files": json_files
+        "files": json_files,
+        "file_stats": file_stats
     }
     
     # 写入索引文件
-    index_file = analysis_dir / 'files_index.json'
     with open(index_file, 'w', encoding='utf-8') as f:
         json.dump(index_data, f, ensure_ascii=False, indent=2)
     
     print(f"[SUCCESS] 索引文件已生成: {index_file}")
-    print(f"[INFO] 找到 {len(json_files)} 个 JSON 文件:")
+    print(f"[INFO] 找到 {len(json_files)} 个 JSON 文件（重新统计 {updated_count} 个）:")
     for i, filename in enumerate(json_files, 1):
-        file_path = analysis_dir / filename
-        file_size = file_path.stat().st_size / 1024  # KB
+        file_size = file_states[filename].st_size / 1024  # KB
         print(f"   {i}. {filename} ({file_size:.1f} KB)")
 
 if __name__ == '__main__':
@@ -5,17 +5,41 @@
 从多个分析结果文件中提取预警和高危问题，通过AI生成综合解决方案
 """
 
+import asyncio
+import heapq
 import json
+import mmap
 import os
-import glob
+import random
+import re
 import sys
 import time
-from collections import Counter
+from itertools import islice
+from operator import itemgetter
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
-from typing import Dict, List, Optional
+from openai import APIStatusError, AsyncOpenAI
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 from json_repair import repair_json
+from cache import (cache_find_similar, cache_get, cache_put, file_extract_get, file_extract_put,
+                   make_cache_key)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
 try:
     from tqdm import tqdm
     HAS_TQDM = True
@@ -33,6 +57,7 @@ except ImportError:
             self.ncols = ncols
             self.leave = leave
             self.start_time = time.time()
+            self._last_refresh = 0.0  # 上次刷新显示的时间（time.monotonic）
         
         @property
         def n(self):
@@ -59,10 +84,15 @@ except ImportError:
         def update(self, n=1):
             self.current += n
             self._n = min((self.current / self.total) * 100, 100) if self.total > 0 else self.current
+            # 限制刷新频率（最多每0.1秒一次），完成时总是刷新
+            now = time.monotonic()
+            if now - self._last_refresh < 0.1 and self.current < self.total:
+                return
             self.refresh()
         
         def refresh(self):
             """刷新显示"""
+            self._last_refresh = time.monotonic()
             elapsed = time.time() - self.start_time
             if self.total > 0:
                 if self.total == 100:
@@ -95,6 +125,7 @@ except ImportError:
         
         def close(self):
             if self.leave:
+                self.refresh()  # 补上被限频跳过的最后一次刷新
                 sys.stdout.write('\n')
             else:
                 # 清除当前行
@@ -108,14 +139,100 @@ load_dotenv()
 API_BASE_URL = os.environ.get("API_BASE_URL", "https://api.tu-zi.com/v1")
 MODEL_NAME = os.environ.get("MODEL_NAME", "claude-sonnet-4-5-20250929")
 API_KEY = os.environ.get("API_KEY", "")
+LOAD_MAX_WORKERS = 8  # 并行加载分析结果文件的最大线程数
+API_TIMEOUT = 60.0  # 单次API请求超时（秒），连接卡住时尽快失败并进入重试
+RETRY_MAX_DELAY = 30.0  # 重试等待时间上限（秒）
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}  # 请求本身有误，重试也不会成功的HTTP状态码
+USE_AIOHTTP = os.environ.get("USE_AIOHTTP") == "1"  # 设为1时绕过SDK，直接用aiohttp请求接口（需安装aiohttp）
+PRETTY_JSON = os.environ.get("PRETTY_JSON") == "1"  # 设为1时解决方案文件以2空格缩进输出，默认紧凑格式
+NO_CACHE = os.environ.get("NO_CACHE") == "1"  # 设为1时忽略已缓存的生成结果（强制重新调用API，新结果仍会写入缓存）和文件筛选结果
+# 提示词/结果处理方式版本：修改提示词模板或结果后处理逻辑时递增，使旧缓存自动失效
+PROMPT_VERSION = 1
+# 缓存键命名空间：模型、接口地址或提示词版本任一变化时，缓存键随之变化
+CACHE_NAMESPACE = f"{MODEL_NAME}|{API_BASE_URL}|v{PROMPT_VERSION}"
+
+# 模型有时仍会用 ```json ... ``` 包裹输出，解析前先去掉首尾代码块标记
+JSON_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|\s*```$')
+# 设为1时在提示词静态前缀上添加 cache_control 标记，启用服务端提示词缓存（需接口支持内容块格式，默认关闭）
+PROMPT_CACHE_CONTROL = os.environ.get("PROMPT_CACHE_CONTROL") == "1"
+STREAM_PROSE_CHECK_CHARS = 200  # 流式接收到这么多字符后仍不是JSON开头，则提前中止并重试
+
+# 安全状态匹配规则（预编译，避免每条数据做多次子串查找）
+HIGH_RISK_PATTERN = re.compile(r'🔴|高危')
+WARNING_PATTERN = re.compile(r'🟡|预警')
+# 筛选规则版本：修改上面的匹配规则或read_analysis_file的筛选逻辑时递增，使已缓存的文件筛选结果失效
+EXTRACT_VERSION = 1
+
+# 平台名称统一表（键为小写名称，处理大小写不一致）
+PLATFORM_NAME_NORMALIZATION = {
+    "deepseek": "DeepSeek",
+}
 
 # ==================== 初始化客户端 ====================
-client = OpenAI(
+# 异步客户端：多个生成任务可以并发等待网络响应
+# 重试由generate_solutions统一处理，关闭SDK内部的自动重试，避免重试次数叠加
+client = AsyncOpenAI(
     base_url=API_BASE_URL,
-    api_key=API_KEY
+    api_key=API_KEY,
+    max_retries=0
 )
 
+# ==================== JSON读写 ====================
+def loads_json(text):
+    """解析JSON文本（安装了orjson时使用orjson；解析失败均抛出json.JSONDecodeError）"""
+    
+    if HAS_ORJSON:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def read_json_file(file_path: str):
+    """读取JSON文件（安装了orjson时通过内存映射直接解析，避免整文件复制）"""
+    
+    with open(file_path, 'rb') as f:
+        if HAS_ORJSON and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        raw = f.read()
+    return loads_json(raw)
+
+def write_json_file(data, file_path: str, pretty: bool = True):
+    """
+    以UTF-8写入JSON文件（pretty为True时2空格缩进，否则紧凑输出；安装了orjson时使用orjson序列化）
+    先写入临时文件再替换目标文件，中途失败不会留下写了一半的文件
+    """
+    
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        content = orjson.dumps(data, option=option)
+    elif pretty:
+        content = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    else:
+        content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 # ==================== 扫描分析结果文件 ====================
+def _scan_dir(analysis_dir: str) -> List[str]:
+    """扫描目录下所有分析结果JSON文件（索引文件不可用时的回退方式）"""
+    
+    if not os.path.exists(analysis_dir):
+        print(f"⚠️  分析结果目录不存在: {analysis_dir}")
+        return []
+    
+    with os.scandir(analysis_dir) as entries:
+        files = [entry.path for entry in entries
+                 if entry.name.endswith(".json") and entry.name != "files_index.json" and entry.is_file()]
+    files.sort()
+    return files
+
 def scan_analysis_files(analysis_dir: str = "analysis_results", index_file: str = "analysis_results/files_index.json") -> List[str]:
     """从索引文件中读取需要分析的文件列表"""
     
@@ -123,21 +240,11 @@ def scan_analysis_files(analysis_dir: str = "analysis_results", index_file: str
     if not os.path.exists(index_file):
         print(f"⚠️  索引文件不存在: {index_file}")
         print(f"   回退到扫描目录模式...")
-        # 回退到原来的扫描方式
-        if not os.path.exists(analysis_dir):
-            print(f"⚠️  分析结果目录不存在: {analysis_dir}")
-            return []
-        
-        pattern = os.path.join(analysis_dir, "*.json")
-        files = glob.glob(pattern)
-        files = [f for f in files if not f.endswith("files_index.json")]
-        files.sort()
-        return files
+        return _scan_dir(analysis_dir)
     
     # 读取索引文件
     try:
-        with open(index_file, 'r', encoding='utf-8') as f:
-            index_data = json.load(f)
+        index_data = read_json_file(index_file)
         
         file_list = index_data.get("files", [])
         
@@ -160,40 +267,76 @@ def scan_analysis_files(analysis_dir: str = "analysis_results", index_file: str
     except Exception as e:
         print(f"✗ 读取索引文件失败 {index_file}: {e}")
         print(f"   回退到扫描目录模式...")
-        # 回退到原来的扫描方式
-        if not os.path.exists(analysis_dir):
-            print(f"⚠️  分析结果目录不存在: {analysis_dir}")
-            return []
-        
-        pattern = os.path.join(analysis_dir, "*.json")
-        files = glob.glob(pattern)
-        files = [f for f in files if not f.endswith("files_index.json")]
-        files.sort()
-        return files
+        return _scan_dir(analysis_dir)
 
 # ==================== 加载分析结果 ====================
-def load_analysis_data(file_path: str, pbar: Optional[tqdm] = None) -> List[Dict]:
-    """加载单个分析结果文件"""
+def iter_analysis_items(file_path: str) -> Iterator[Dict]:
+    """逐条读取单个分析结果文件（安装了ijson时流式解析，否则整体加载）"""
     
+    if HAS_IJSON:
+        with open(file_path, 'rb') as f:
+            yield from ijson.items(f, 'item', use_float=True)
+    else:
+        yield from read_json_file(file_path)
+
+def read_analysis_file(file_path: str) -> Tuple[Dict[str, List[Dict]], int, Optional[Exception]]:
+    """
+    读取单个分析结果文件，边读取边筛选，不做任何输出（可在线程池中调用）
+    返回 (按安全状态分类的预警/高危问题, 文件总条数, 异常)，读取失败时问题为空并返回异常
+    """
+    
+    critical_issues = {
+        "高危": [],
+        "预警": []
+    }
+    total_count = 0
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        filename = os.path.basename(file_path)
+        for category, item in iter_critical_issues(iter_analysis_items(file_path)):
+            total_count += 1
+            if category:
+                critical_issues[category].append(item)
+    except Exception as e:
+        return {"高危": [], "预警": []}, 0, e
+    
+    return critical_issues, total_count, None
+
+def get_cached_extract(file_path: str) -> Tuple[Optional[os.stat_result], Optional[Dict]]:
+    """
+    查询文件的筛选结果缓存（在主线程中调用，缓存读取失败时的警告不会与线程池输出交错）
+    返回 (文件状态, 缓存结果)，文件与筛选规则都未变化且未设置NO_CACHE时缓存结果不为None
+    """
+    
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None, None  # 交给read_analysis_file报告读取错误
+    if NO_CACHE:
+        return st, None
+    return st, file_extract_get(file_path, st.st_size, st.st_mtime_ns, EXTRACT_VERSION)
+
+def report_file_loaded(file_path: str, total_count: int, error: Optional[Exception], pbar: Optional[tqdm] = None):
+    """输出单个文件的加载结果（有进度条时只更新描述，避免重复输出）"""
+    
+    filename = os.path.basename(file_path)
+    if error is None:
         if pbar:
-            # 只更新描述，不打印，避免重复输出
-            pbar.set_description(f"加载: {filename[:25]}... ({len(data)}条)")
+            pbar.set_description(f"加载: {filename[:25]}... ({total_count}条)")
         else:
-            print(f"✓ 加载文件: {filename} ({len(data)} 条数据)")
-        return data
-    except Exception as e:
+            print(f"✓ 加载文件: {filename} ({total_count} 条数据)")
+    else:
         if pbar:
-            pbar.set_description(f"✗ 加载失败: {os.path.basename(file_path)[:30]}...")
+            pbar.set_description(f"✗ 加载失败: {filename[:30]}...")
         else:
-            print(f"✗ 加载文件失败 {file_path}: {e}")
-        return []
+            print(f"✗ 加载文件失败 {file_path}: {error}")
 
 # ==================== 加载GEO方法论文件 ====================
+@lru_cache(maxsize=4)
+def _read_text_file(file_path: str, mtime: float) -> str:
+    """读取文本文件；以(路径, 修改时间)为缓存键，文件修改后会重新读取"""
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
 def load_geo_methodology(method_file: str = "ref_md/GEO方法论与实战全案.md") -> str:
     """加载GEO方法论文件内容"""
     
@@ -202,8 +345,7 @@ def load_geo_methodology(method_file: str = "ref_md/GEO方法论与实战全案.
             print(f"⚠️  GEO方法论文件不存在: {method_file}")
             return ""
         
-        with open(method_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = _read_text_file(method_file, os.path.getmtime(method_file))
         
         print(f"✓ 已加载GEO方法论文件: {method_file}")
         return content
@@ -217,125 +359,68 @@ def extract_platforms(critical_issues: Dict[str, List[Dict]]) -> str:
     从关键问题中提取平台信息
     返回最常见的平台，如果有多个平台则返回平台列表
     """
-    all_platforms = []
+    platform_counts = {}
+    total_count = 0
+    normalize = PLATFORM_NAME_NORMALIZATION.get
     for category in ["高危", "预警"]:
         for item in critical_issues[category]:
             platform = item.get("Platform", "").strip()
             if platform:
                 # 统一平台名称（处理大小写不一致）
-                platform_normalized = platform
-                if platform.lower() == "deepseek":
-                    platform_normalized = "DeepSeek"
-                all_platforms.append(platform_normalized)
+                platform = normalize(platform.lower(), platform)
+                platform_counts[platform] = platform_counts.get(platform, 0) + 1
+                total_count += 1
     
-    if not all_platforms:
+    if not total_count:
         return "多个AI平台"
     
-    # 统计平台出现次数
-    platform_counter = Counter(all_platforms)
+    # 出现次数最多的前3个平台（次数相同时保持首次出现的顺序）
+    top_platforms = heapq.nlargest(3, platform_counts.items(), key=itemgetter(1))
     
     # 如果只有一个平台或某个平台占主导（>70%），返回该平台
-    most_common_platform, count = platform_counter.most_common(1)[0]
-    total_count = len(all_platforms)
+    most_common_platform, count = top_platforms[0]
     
     if count / total_count > 0.7:
         return most_common_platform
     else:
         # 多个平台，返回前3个最常见的平台
-        top_platforms = [p for p, _ in platform_counter.most_common(3)]
-        return "、".join(top_platforms)
+        return "、".join(p for p, _ in top_platforms)
 
 # ==================== 提取预警和高危内容 ====================
-def extract_critical_issues(all_data: List[Dict], show_progress: bool = True) -> Dict[str, List[Dict]]:
-    """
-    提取所有预警(🟡)和高危(🔴)的分析结果
-    按安全状态分类
-    """
-    
-    critical_issues = {
-        "高危": [],
-        "预警": []
-    }
-    
-    if show_progress:
-        pbar = tqdm(total=len(all_data), desc="提取关键问题", unit="条", ncols=80, leave=False)
-    else:
-        pbar = None
-    
-    current_count = 0
-    try:
-        for item in all_data:
-            security_status = item.get("Security_Status", "")
-            
-            if "🔴" in security_status or "高危" in security_status:
-                critical_issues["高危"].append(item)
-            elif "🟡" in security_status or "预警" in security_status:
-                critical_issues["预警"].append(item)
-            
-            if pbar:
-                pbar.update(1)
-                current_count += 1
-                # 减少更新频率，避免过于频繁的刷新
-                update_interval = max(1, len(all_data) // 20)
-                if current_count % update_interval == 0 or current_count == len(all_data):
-                    pbar.set_description(f"提取中 (高危:{len(critical_issues['高危'])}, 预警:{len(critical_issues['预警'])})")
-    finally:
-        if pbar:
-            pbar.close()
+@lru_cache(maxsize=256)
+def _classify_status_text(security_status: str) -> Optional[str]:
+    """对单个安全状态文本分类（状态取值只有少数几种，结果按文本缓存）"""
     
-    return critical_issues
+    if HIGH_RISK_PATTERN.search(security_status):
+        return "高危"
+    if WARNING_PATTERN.search(security_status):
+        return "预警"
+    return None
 
-# ==================== 构建综合分析提示词 ====================
-def build_synthesis_prompt(critical_issues: Dict[str, List[Dict]], method_content: str, platform: str) -> str:
-    """构建用于生成综合解决方案的提示词"""
-    
-    # 统计信息
-    high_risk_count = len(critical_issues["高危"])
-    warning_count = len(critical_issues["预警"])
-    
-    # 准备高危问题摘要
-    high_risk_summary = []
-    for idx, item in enumerate(critical_issues["高危"][:10], 1):  # 最多展示10个
-        high_risk_summary.append(f"""
-【高危问题 {idx}】
-- 平台: {item.get('Platform', 'N/A')}
-- 用户提问: {item.get('User_Query', 'N/A')}
-- 风险诊断: {item.get('Risk_Diagnosis', 'N/A')[:200]}...
-- 策略建议: {item.get('Strategy_Action', 'N/A')[:300]}...
-""")
+def classify_security_status(item: Dict) -> Optional[str]:
+    """根据Security_Status判断条目类别，返回"高危"、"预警"或None"""
     
-    # 准备预警问题摘要
-    warning_summary = []
-    for idx, item in enumerate(critical_issues["预警"][:15], 1):  # 最多展示15个
-        warning_summary.append(f"""
-【预警问题 {idx}】
-- 平台: {item.get('Platform', 'N/A')}
-- 用户提问: {item.get('User_Query', 'N/A')}
-- 风险诊断: {item.get('Risk_Diagnosis', 'N/A')[:200]}...
-- 品牌印象评分: {item.get('Brand_Impression', 'N/A')[:100]}...
-""")
-    
-    prompt = f"""你是一位资深的GEO (Generative Engine Optimization，生成式引擎优化) 专家和AI内容生态治理顾问，专注于新能源汽车行业的品牌声誉管理。
-
-# 任务背景
+    return _classify_status_text(item.get("Security_Status", ""))
 
-我们对赛力斯/问界品牌在 **{platform}** 的内容表现进行了全面分析，发现了{high_risk_count}个高危问题和{warning_count}个预警问题。这些问题可能严重影响品牌在AI引擎中的呈现和用户决策。
-
-# 高危问题汇总
-
-{chr(10).join(high_risk_summary)}
-
-# 预警问题汇总
+def iter_critical_issues(items: Iterable[Dict]) -> Iterator[Tuple[Optional[str], Dict]]:
+    """逐条产出 (类别, 条目)，非预警/高危条目的类别为None，便于调用方统计总数"""
+    
+    for item in items:
+        yield classify_security_status(item), item
 
-{chr(10).join(warning_summary)}
+# ==================== 构建综合分析提示词 ====================
+# 提示词静态部分（只依赖GEO方法论，模块加载时定义一次，构建时直接拼接）
+SYNTHESIS_PROMPT_HEADER = """你是一位资深的GEO (Generative Engine Optimization，生成式引擎优化) 专家和AI内容生态治理顾问，专注于新能源汽车行业的品牌声誉管理。
 
 # GEO方法论框架（必须严格遵循）
 
-{method_content}
+"""
+
+SYNTHESIS_PROMPT_INSTRUCTIONS = """
 
 # 你的任务
 
-请基于以上GEO方法论和实际问题分析，**从3-6个不同维度**提出综合解决方案。
+请基于以上GEO方法论和下文【任务背景】中的实际问题分析，**从3-6个不同维度**提出综合解决方案。
 
 **重要原则**：
 
@@ -350,7 +435,7 @@ def build_synthesis_prompt(critical_issues: Dict[str, List[Dict]], method_conten
 
 - **内容矩阵构建维度**：聚焦E-E-A-T增强、DSS标准（深度/数据/权威）落实，以及"认知真空"的发现与填补。
 - **技术SEO基础设施维度**：Schema标记（Article/Product）、GEOHead动态注入、LLMS.txt站点地图建设等针对AI Bot的优化。
-- **平台差异化渠道维度**：基于GEO方法论中"平台底层逻辑"图表，制定针对 **{platform}** 的差异化投喂策略（如DeepSeek偏向技术源，豆包偏向字节系）。
+- **平台差异化渠道维度**：基于GEO方法论中"平台底层逻辑"图表，制定针对 **目标平台** 的差异化投喂策略（如DeepSeek偏向技术源，豆包偏向字节系）。
 - **关键词策略维度**：核心大词与长尾问句（Long-tail Questions）的结合，以及“卡片式”数据引用格式的部署。
 - **品牌实体的权威性维度**：专家矩阵建立、维基百科/权威媒体提及（Mentions）、Canonical标签规范化。
 
@@ -364,7 +449,7 @@ def build_synthesis_prompt(critical_issues: Dict[str, List[Dict]], method_conten
 
 请严格按照以下JSON格式输出，不要添加任何其他文字、注释或说明：
 
-{{ "metadata": {{ "生成时间": "{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", "分析数据来源": "赛力斯舆情分析系统", "目标平台": "{platform}", "高危问题数量": {high_risk_count}, "预警问题数量": {warning_count}, "总问题数量": {high_risk_count + warning_count} }}, "executive_summary": {{ "核心问题概述": "用2-3句话总结当前最严重的声誉风险", "紧急程度评估": "高/中/低", "预计影响范围": "描述这些问题可能影响的用户群体和决策场景" }}, "solutions": [ {{ "dimension": "维度名称（必须对应GEO方法论中的策略方向，如'内容矩阵构建'或'技术SEO优化'）", "priority": "高/中/低", "target_problems": ["针对的核心问题1", "针对的核心问题2"], "strategy_overview": "该维度的整体策略描述（200字左右）。请务必聚焦于解决方案的**具体内容**（Content）和执行逻辑，必须引用GEO方法论中的具体概念（如'认知真空'、'DSS原则'等），拒绝空话套话。", "geo_principles": ["应用的GEO原则1（如：摘要前置）", "应用的GEO原则2（如：GEOHead注入）"], "action_items": [ {{ "action": "具体行动项标题", "description": "详细描述该行动项的执行内容。若为内容策略，请提供**具体选题、核心话术或数据引用格式**；若为技术策略，请提供**具体工具配置或标签写法**。**禁止**包含任何需要直接与AI平台官方沟通的内容（如提交请求包、申诉等），必须通过GEO技术手段实现。", "geo_method": "对应的GEO方法（需与GEO方法论保持一致）", "platforms": ["{platform}"], "expected_outcome": "预期效果（如：AI可见性指数提升）", "timeline": "执行时间线（必须完整，不能截断）", "kpi": "关键绩效指标" }} ], "resources_needed": ["所需资源1", "所需资源2"], "risk_mitigation": "该策略可能遇到的风险及应对方式（必须完整描述，不能省略）" }} // 请根据实际情况生成3-6个维度的解决方案对象，**每个维度必须包含完整的action_items（至少2-3个）、resources_needed和risk_mitigation字段，严禁省略或截断** ], "implementation_roadmap": {{ "phase_1_immediate": {{ "timeframe": "0-2周（依据GEO方法论中的'排名上榜'阶段）", "focus": "最紧急的行动", "key_milestones": ["里程碑1", "里程碑2"] }}, "phase_2_short_term": {{ "timeframe": "2周-2个月", "focus": "短期改善", "key_milestones": ["里程碑"] }}, "phase_3_long_term": {{ "timeframe": "2-6个月（依据GEO方法论中的'排名优化'阶段）", "focus": "长期建设", "key_milestones": ["里程碑"] }} }}, "success_metrics": {{ "primary_kpis": [ {{ "indicator": "指标名称（参考GEO方法论中的KPI部分，如AI可见性指数）", "current_baseline": "当前基线", "target_3_months": "3个月目标", "target_6_months": "6个月目标" }} ] }} }}
+{ "metadata": { "生成时间": "（由程序自动填写）", "分析数据来源": "赛力斯舆情分析系统", "目标平台": "（由程序自动填写）", "高危问题数量": "（由程序自动填写）", "预警问题数量": "（由程序自动填写）", "总问题数量": "（由程序自动填写）" }, "executive_summary": { "核心问题概述": "用2-3句话总结当前最严重的声誉风险", "紧急程度评估": "高/中/低", "预计影响范围": "描述这些问题可能影响的用户群体和决策场景" }, "solutions": [ { "dimension": "维度名称（必须对应GEO方法论中的策略方向，如'内容矩阵构建'或'技术SEO优化'）", "priority": "高/中/低", "target_problems": ["针对的核心问题1", "针对的核心问题2"], "strategy_overview": "该维度的整体策略描述（200字左右）。请务必聚焦于解决方案的**具体内容**（Content）和执行逻辑，必须引用GEO方法论中的具体概念（如'认知真空'、'DSS原则'等），拒绝空话套话。", "geo_principles": ["应用的GEO原则1（如：摘要前置）", "应用的GEO原则2（如：GEOHead注入）"], "action_items": [ { "action": "具体行动项标题", "description": "详细描述该行动项的执行内容。若为内容策略，请提供**具体选题、核心话术或数据引用格式**；若为技术策略，请提供**具体工具配置或标签写法**。**禁止**包含任何需要直接与AI平台官方沟通的内容（如提交请求包、申诉等），必须通过GEO技术手段实现。", "geo_method": "对应的GEO方法（需与GEO方法论保持一致）", "platforms": ["目标平台名称"], "expected_outcome": "预期效果（如：AI可见性指数提升）", "timeline": "执行时间线（必须完整，不能截断）", "kpi": "关键绩效指标" } ], "resources_needed": ["所需资源1", "所需资源2"], "risk_mitigation": "该策略可能遇到的风险及应对方式（必须完整描述，不能省略）" } // 请根据实际情况生成3-6个维度的解决方案对象，**每个维度必须包含完整的action_items（至少2-3个）、resources_needed和risk_mitigation字段，严禁省略或截断** ], "implementation_roadmap": { "phase_1_immediate": { "timeframe": "0-2周（依据GEO方法论中的'排名上榜'阶段）", "focus": "最紧急的行动", "key_milestones": ["里程碑1", "里程碑2"] }, "phase_2_short_term": { "timeframe": "2周-2个月", "focus": "短期改善", "key_milestones": ["里程碑"] }, "phase_3_long_term": { "timeframe": "2-6个月（依据GEO方法论中的'排名优化'阶段）", "focus": "长期建设", "key_milestones": ["里程碑"] } }, "success_metrics": { "primary_kpis": [ { "indicator": "指标名称（参考GEO方法论中的KPI部分，如AI可见性指数）", "current_baseline": "当前基线", "target_3_months": "3个月目标", "target_6_months": "6个月目标" } ] } }
 
 关键要求：
 
@@ -387,11 +472,94 @@ def build_synthesis_prompt(critical_issues: Dict[str, List[Dict]], method_conten
    - **如果内容较长，请确保所有字段都完整输出，不要因为长度限制而省略**
 7. **输出必须是纯JSON格式**，可以被标准JSON解析器解析。
 8. **不要用`json`包裹，不要添加任何解释文字**。
+"""
+
+# 问题摘要模板（%格式化，逐条填充）
+HIGH_RISK_SUMMARY_TEMPLATE = """
+【高危问题 %d】
+- 平台: %s
+- 用户提问: %s
+- 风险诊断: %s
+- 策略建议: %s
+"""
+
+WARNING_SUMMARY_TEMPLATE = """
+【预警问题 %d】
+- 平台: %s
+- 用户提问: %s
+- 风险诊断: %s
+- 品牌印象评分: %s
+"""
+
+def clip_text(text: str, max_length: int) -> str:
+    """截断过长的文本，仅在确实截断时追加省略号"""
+    
+    if len(text) <= max_length:
+        return text
+    return text[:max_length] + "..."
+
+def format_issue_summary(template: str, idx: int, item: Dict, extra_field: str, extra_limit: int) -> str:
+    """
+    按模板格式化单条问题摘要：序号、平台、用户提问、风险诊断（截断至200字）
+    以及模板最后一项extra_field（截断至extra_limit字）
+    """
+    
+    get = item.get
+    return template % (
+        idx,
+        get('Platform', 'N/A'),
+        get('User_Query', 'N/A'),
+        clip_text(get('Risk_Diagnosis', 'N/A'), 200),
+        clip_text(get(extra_field, 'N/A'), extra_limit)
+    )
+
+def build_synthesis_prompt(critical_issues: Dict[str, List[Dict]], method_content: str, platform: str) -> Tuple[str, str]:
+    """
+    构建用于生成综合解决方案的提示词
+    返回 (静态前缀, 动态部分)：静态前缀只依赖GEO方法论，多次运行保持不变，便于服务端提示词缓存命中；
+    目标平台、问题统计和问题摘要全部放在动态部分
+    """
+    
+    # 统计信息
+    high_risk_count = len(critical_issues["高危"])
+    warning_count = len(critical_issues["预警"])
+    
+    # 准备高危问题摘要
+    high_risk_summary = "\n".join(
+        format_issue_summary(HIGH_RISK_SUMMARY_TEMPLATE, idx, item, 'Strategy_Action', 300)
+        for idx, item in enumerate(islice(critical_issues["高危"], 10), 1)  # 最多展示10个
+    )
+    
+    # 准备预警问题摘要
+    warning_summary = "\n".join(
+        format_issue_summary(WARNING_SUMMARY_TEMPLATE, idx, item, 'Brand_Impression', 100)
+        for idx, item in enumerate(islice(critical_issues["预警"], 15), 1)  # 最多展示15个
+    )
+    
+    prompt_prefix = "".join((SYNTHESIS_PROMPT_HEADER, method_content, SYNTHESIS_PROMPT_INSTRUCTIONS))
+    
+    prompt_body = f"""
+# 任务背景
+
+我们对赛力斯/问界品牌在 **{platform}** 的内容表现进行了全面分析，发现了{high_risk_count}个高危问题和{warning_count}个预警问题。这些问题可能严重影响品牌在AI引擎中的呈现和用户决策。
+
+本次的目标平台为 **{platform}**：平台差异化策略请针对该平台制定，action_items中的platforms字段请填写该平台。
+
+# 高危问题汇总
+
+{high_risk_summary}
+
+# 预警问题汇总
+
+{warning_summary}
 """
     
-    return prompt
+    return prompt_prefix, prompt_body
 
 # ==================== 验证解决方案完整性 ====================
+ACTION_ITEM_REQUIRED_FIELDS = ("action", "description", "geo_method", "platforms", "expected_outcome", "timeline", "kpi")
+TRUNCATION_SUFFIXES = ("互", "...")  # 常见截断结尾
+
 def validate_solution_completeness(result: Dict) -> List[str]:
     """验证生成的解决方案是否完整"""
     errors = []
@@ -409,14 +577,15 @@ def validate_solution_completeness(result: Dict) -> List[str]:
         
         # 检查每个action_item的完整性
         for i, item in enumerate(action_items, 1):
-            required_fields = ["action", "description", "geo_method", "platforms", "expected_outcome", "timeline", "kpi"]
-            for field in required_fields:
-                if field not in item or not item[field] or (isinstance(item[field], str) and len(item[field].strip()) == 0):
+            get = item.get
+            for field in ACTION_ITEM_REQUIRED_FIELDS:
+                value = get(field)
+                if not value or (isinstance(value, str) and not value.strip()):
                     errors.append(f"{dimension} - action_item {i}: 缺少或为空字段 '{field}'")
             
             # 检查timeline是否被截断（以常见截断字符结尾）
-            timeline = item.get("timeline", "")
-            if timeline and (timeline.endswith("互") or timeline.endswith("...") or len(timeline) < 10):
+            timeline = get("timeline", "")
+            if timeline and (timeline.endswith(TRUNCATION_SUFFIXES) or len(timeline) < 10):
                 errors.append(f"{dimension} - action_item {i}: timeline可能被截断")
         
         # 检查resources_needed
@@ -433,13 +602,194 @@ def validate_solution_completeness(result: Dict) -> List[str]:
     
     return errors
 
+# ==================== 填写元数据 ====================
+def fill_solution_metadata(result: Dict, critical_issues: Dict[str, List[Dict]], platform: str,
+                           run_ts: datetime) -> Dict:
+    """由程序填写metadata中的客观字段（生成时间、目标平台、问题数量），不依赖模型输出"""
+    
+    high_risk_count = len(critical_issues["高危"])
+    warning_count = len(critical_issues["预警"])
+    metadata = result.setdefault("metadata", {})
+    metadata["生成时间"] = run_ts.strftime('%Y-%m-%d %H:%M:%S')
+    metadata["目标平台"] = platform
+    metadata["高危问题数量"] = high_risk_count
+    metadata["预警问题数量"] = warning_count
+    metadata["总问题数量"] = high_risk_count + warning_count
+    return result
+
+# ==================== 问题集合特征 ====================
+def build_issue_signature(critical_issues: Dict[str, List[Dict]]) -> List[str]:
+    """生成关键问题的特征集合（平台|用户提问|安全状态），用于近似缓存匹配"""
+    
+    return sorted({
+        f"{item.get('Platform', '')}|{item.get('User_Query', '')}|{item.get('Security_Status', '')}"
+        for category in ["高危", "预警"]
+        for item in critical_issues[category]
+    })
+
+# ==================== 流式调用API ====================
+def build_messages(prompt_prefix: str, prompt_body: str) -> List[Dict]:
+    """组装请求消息；启用提示词缓存时，静态前缀单独作为一个带cache_control的内容块"""
+    
+    if PROMPT_CACHE_CONTROL:
+        content = [
+            {"type": "text", "text": prompt_prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt_body}
+        ]
+    else:
+        content = prompt_prefix + prompt_body
+    return [{"role": "user", "content": content}]
+
+async def _iter_sdk_deltas(messages: List[Dict]) -> AsyncIterator[str]:
+    """通过OpenAI SDK流式请求，逐段产出回复文本"""
+    
+    stream = await client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=messages,
+        temperature=0.3,
+        max_tokens=16000,  # 增加token限制，确保完整输出
+        stream=True,
+        timeout=API_TIMEOUT
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.response.aclose()
+
+_aiohttp_session = None
+
+def _get_aiohttp_session():
+    """获取共享的aiohttp会话（须在事件循环内调用，首次使用时创建）"""
+    
+    global _aiohttp_session
+    if _aiohttp_session is None or _aiohttp_session.closed:
+        _aiohttp_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=API_TIMEOUT, sock_read=API_TIMEOUT)
+        )
+    return _aiohttp_session
+
+async def close_aiohttp_session():
+    """关闭共享的aiohttp会话（未创建时不做任何事）"""
+    
+    global _aiohttp_session
+    if _aiohttp_session is not None and not _aiohttp_session.closed:
+        await _aiohttp_session.close()
+    _aiohttp_session = None
+
+async def _iter_aiohttp_deltas(messages: List[Dict]) -> AsyncIterator[str]:
+    """直接用aiohttp请求 /chat/completions 并解析SSE流，逐段产出回复文本"""
+    
+    session = _get_aiohttp_session()
+    async with session.post(
+        f"{API_BASE_URL.rstrip('/')}/chat/completions",
+        headers={"Authorization": f"Bearer {API_KEY}"},
+        json={
+            "model": MODEL_NAME,
+            "messages": messages,
+            "temperature": 0.3,
+            "max_tokens": 16000,
+            "stream": True
+        }
+    ) as resp:
+        resp.raise_for_status()
+        async for line in resp.content:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            payload = line[len(b"data:"):].strip()
+            if payload == b"[DONE]":
+                break
+            choices = loads_json(payload).get("choices") or []
+            if choices and choices[0].get("delta", {}).get("content"):
+                yield choices[0]["delta"]["content"]
+
+async def stream_completion_text(messages: List[Dict], status_pbar: Optional[tqdm] = None) -> str:
+    """
+    以流式方式调用API并拼接完整回复（USE_AIOHTTP=1时绕过SDK直接请求接口）
+    若回复开头明显不是JSON（如模型先输出了说明文字），提前中止连接，以便尽快重试
+    """
+    
+    if USE_AIOHTTP and HAS_AIOHTTP:
+        deltas = _iter_aiohttp_deltas(messages)
+    else:
+        deltas = _iter_sdk_deltas(messages)
+    
+    chunks = []
+    received = 0
+    head_checked = False
+    try:
+        async for content in deltas:
+            chunks.append(content)
+            received += len(content)
+            
+            if not head_checked and received >= STREAM_PROSE_CHECK_CHARS:
+                head_checked = True
+                head = "".join(chunks).lstrip()
+                if not head.startswith(("{", "```")):
+                    raise ValueError(f"响应开头不是JSON: {head[:30]}")
+            
+            if status_pbar and len(chunks) % 50 == 0:
+                status_pbar.set_description(f"接收响应中 ({received}字符)...")
+    finally:
+        # 提前中止时关闭底层连接，避免服务端继续生成
+        await deltas.aclose()
+    
+    return "".join(chunks)
+
 # ==================== 调用AI生成综合解决方案 ====================
-def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: str, platform: str, max_retries: int = 3) -> Dict:
-    """调用AI生成综合解决方案"""
+def error_status(error: Exception) -> Tuple[Optional[int], Optional[str]]:
+    """取出请求失败时的HTTP状态码和Retry-After响应头（SDK与aiohttp两种请求方式），非HTTP错误返回 (None, None)"""
+    
+    if isinstance(error, APIStatusError):
+        return error.status_code, error.response.headers.get("retry-after")
+    if HAS_AIOHTTP and isinstance(error, aiohttp.ClientResponseError):
+        return error.status, (error.headers or {}).get("Retry-After")
+    return None, None
+
+def retry_delay(attempt: int, error: Exception) -> float:
+    """
+    计算第attempt次失败后的等待时间（秒）
+    服务端返回Retry-After时按其等待，否则指数退避并加入随机抖动，避免多个任务同时重试
+    """
+    
+    _, retry_after = error_status(error)
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), RETRY_MAX_DELAY)
+        except ValueError:
+            pass  # HTTP日期格式，按指数退避处理
+    return min(2 ** attempt, RETRY_MAX_DELAY) * random.uniform(0.5, 1.5)
+
+async def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: str, platform: str,
+                             max_retries: int = 3, run_ts: Optional[datetime] = None) -> Dict:
+    """调用AI生成综合解决方案（run_ts为本次运行时间，用于metadata中的生成时间）"""
+    
+    run_ts = run_ts or datetime.now()
     
     print(f"正在生成综合解决方案 (高危:{len(critical_issues['高危'])}个, 预警:{len(critical_issues['预警'])}个, 平台:{platform})...")
     
-    prompt = build_synthesis_prompt(critical_issues, method_content, platform)
+    prompt_prefix, prompt_body = build_synthesis_prompt(critical_issues, method_content, platform)
+    messages = build_messages(prompt_prefix, prompt_body)
+    
+    # 相同模型/接口/提示词版本+提示词的结果直接从本地缓存读取，跳过API调用；
+    # 未精确命中时，再在方法论/平台相同的缓存中查找问题集合几乎一致的结果
+    cache_key = make_cache_key(CACHE_NAMESPACE, prompt_prefix + prompt_body)
+    cache_context = make_cache_key(CACHE_NAMESPACE, f"{platform}\n{method_content}")
+    issue_signature = build_issue_signature(critical_issues)
+    cached = None
+    if not NO_CACHE:
+        cached = cache_get(cache_key)
+        if cached is not None:
+            print("✓ 命中本地缓存，跳过API调用")
+        else:
+            cached = cache_find_similar(cache_context, issue_signature)
+            if cached is not None:
+                print("✓ 命中相似问题集合的缓存结果，跳过API调用")
+    if cached is not None:
+        return fill_solution_metadata(cached, critical_issues, platform, run_ts)
     
     # 显示进度状态
     with tqdm(total=100, desc="AI生成中", unit="%", ncols=80, leave=False) as status_pbar:
@@ -458,17 +808,10 @@ def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: s
                 status_pbar.refresh()
                 
                 start_time = time.time()
-                response = client.chat.completions.create(
-                    model=MODEL_NAME,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.3,
-                    max_tokens=16000  # 增加token限制，确保完整输出
-                )
+                result_text = await stream_completion_text(messages, status_pbar)
                 elapsed = time.time() - start_time
                 
-                result_text = response.choices[0].message.content.strip()
+                result_text = JSON_FENCE_PATTERN.sub('', result_text.strip())
                 
                 status_pbar.set_description("正在解析响应...")
                 status_pbar.n = 80
@@ -476,7 +819,7 @@ def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: s
                 
                 # 尝试解析JSON
                 try:
-                    result = json.loads(result_text)
+                    result = loads_json(result_text)
                     
                     # 验证JSON完整性
                     validation_errors = validate_solution_completeness(result)
@@ -485,6 +828,9 @@ def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: s
                         for error in validation_errors:
                             status_pbar.write(f"  - {error}")
                     
+                    fill_solution_metadata(result, critical_issues, platform, run_ts)
+                    cache_put(cache_key, result, context=cache_context, signature=issue_signature)
+                    
                     status_pbar.n = 100
                     status_pbar.set_description("✓ 生成成功")
                     status_pbar.refresh()
@@ -494,8 +840,9 @@ def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: s
                     # 尝试修复JSON
                     status_pbar.set_description("修复JSON格式...")
                     status_pbar.refresh()
-                    repaired = repair_json(result_text)
-                    result = json.loads(repaired)
+                    # 上面已经尝试过json.loads，修复时跳过其内部的重复解析
+                    repaired = repair_json(result_text, skip_json_loads=True)
+                    result = loads_json(repaired)
                     
                     # 验证修复后的JSON完整性
                     validation_errors = validate_solution_completeness(result)
@@ -504,6 +851,9 @@ def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: s
                         for error in validation_errors:
                             status_pbar.write(f"  - {error}")
                     
+                    fill_solution_metadata(result, critical_issues, platform, run_ts)
+                    cache_put(cache_key, result, context=cache_context, signature=issue_signature)
+                    
                     status_pbar.n = 100
                     status_pbar.set_description("✓ 修复成功")
                     status_pbar.refresh()
@@ -518,41 +868,58 @@ def generate_solutions(critical_issues: Dict[str, List[Dict]], method_content: s
                 if attempt == 0:
                     status_pbar.write(f"✗ 尝试 {attempt + 1} 失败: {str(e)[:50]}...")
                 
-                if attempt == max_retries - 1:
-                    print(f"✗ 已达到最大重试次数")
+                status_code, _ = error_status(e)
+                retryable = status_code not in NON_RETRYABLE_STATUS
+                if attempt == max_retries - 1 or not retryable:
+                    print(f"✗ 已达到最大重试次数" if retryable else f"✗ 请求无法重试 (HTTP {status_code})")
                     return {
                         "error": "生成失败",
                         "message": str(e),
                         "metadata": {
-                            "生成时间": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                            "生成时间": run_ts.strftime('%Y-%m-%d %H:%M:%S'),
                             "高危问题数量": len(critical_issues['高危']),
                             "预警问题数量": len(critical_issues['预警'])
                         }
                     }
                 else:
-                    # 等待后重试
-                    wait_time = min(2 ** attempt, 10)  # 指数退避，最多10秒
-                    status_pbar.set_description(f"等待 {wait_time}s 后重试...")
+                    # 等待后重试：优先遵循Retry-After，否则指数退避并加入随机抖动
+                    wait_time = retry_delay(attempt, e)
+                    status_pbar.set_description(f"等待 {wait_time:.1f}s 后重试...")
                     status_pbar.refresh()
-                    for i in range(wait_time):
-                        time.sleep(1)
-                        status_pbar.n = min(status_pbar.n + (100 // wait_time), 99)
-                        status_pbar.refresh()
+                    await asyncio.sleep(wait_time)
     
     return {}
 
+async def generate_solutions_concurrently(jobs: List[Tuple[str, Dict[str, List[Dict]]]], method_content: str,
+                                         run_ts: Optional[datetime] = None) -> List[Dict]:
+    """
+    并发生成多组解决方案，jobs为 (平台, 关键问题) 列表，返回结果与jobs顺序一致
+    各任务的API调用在网络等待上相互重叠，总耗时接近最慢的单个任务
+    """
+    
+    try:
+        return await asyncio.gather(*(
+            generate_solutions(critical_issues, method_content, platform, run_ts=run_ts)
+            for platform, critical_issues in jobs
+        ))
+    finally:
+        await close_aiohttp_session()
+
 # ==================== 保存解决方案 ====================
-def save_solutions(solutions: Dict, output_dir: str = "solution"):
-    """保存综合解决方案到JSON文件"""
+def save_solutions(solutions: Dict, output_dir: str = "solution", run_ts: Optional[datetime] = None,
+                   pretty: bool = PRETTY_JSON):
+    """
+    保存综合解决方案到JSON文件（文件名使用本次运行时间run_ts，与metadata保持一致）
+    默认紧凑输出，pretty为True（或环境变量PRETTY_JSON=1）时缩进排版
+    """
     
     os.makedirs(output_dir, exist_ok=True)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = (run_ts or datetime.now()).strftime("%Y%m%d_%H%M%S")
     filename = f"综合解决方案_{timestamp}.json"
     filepath = os.path.join(output_dir, filename)
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(solutions, f, ensure_ascii=False, indent=2)
+    write_json_file(solutions, filepath, pretty=pretty)
     
     print(f"\n{'='*80}")
     print(f"✓ 综合解决方案已保存至: {filepath}")
@@ -593,6 +960,9 @@ def main():
         print("⚠️  错误: 请在.env文件中配置API_KEY")
         return
     
+    # 本次运行时间：生成时间与输出文件名共用同一时间戳
+    run_ts = datetime.now()
+    
     # 整体进度跟踪
     total_steps = 6
     current_step = 0
@@ -618,22 +988,39 @@ def main():
         for idx, file in enumerate(files, 1):
             print(f"  {idx}. {os.path.basename(file)}")
     
-    # 步骤2: 加载所有分析数据
+    # 步骤2: 加载分析数据（边读取边筛选，不保留安全条目）
     update_main_progress("加载分析数据")
-    all_data = []
+    critical_issues = {
+        "高危": [],
+        "预警": []
+    }
+    total_count = 0
     
-    with tqdm(total=len(files), desc="加载文件", unit="个", ncols=80, leave=False) as pbar:
-        for file in files:
-            data = load_analysis_data(file, pbar)
-            all_data.extend(data)
+    # 未变化的文件直接使用上次的筛选结果；其余文件相互独立，使用线程池并行读取与解析
+    # 缓存读写与进度条都只在主线程中进行，按原文件顺序合并结果
+    cached_extracts = [get_cached_extract(file) for file in files]
+    to_read = [file for file, (_, cached) in zip(files, cached_extracts) if cached is None]
+    with tqdm(total=len(files), desc="加载文件", unit="个", ncols=80, leave=False) as pbar, \
+            ThreadPoolExecutor(max_workers=max(1, min(LOAD_MAX_WORKERS, len(to_read)))) as executor:
+        read_results = executor.map(read_analysis_file, to_read)
+        for file, (st, cached) in zip(files, cached_extracts):
+            if cached is not None:
+                file_issues, file_count, error = {"高危": cached["高危"], "预警": cached["预警"]}, cached["total"], None
+            else:
+                file_issues, file_count, error = next(read_results)
+                if error is None and st is not None and not NO_CACHE:
+                    file_extract_put(file, st.st_size, st.st_mtime_ns, EXTRACT_VERSION,
+                                     {**file_issues, "total": file_count})
+            report_file_loaded(file, file_count, error, pbar)
+            critical_issues["高危"].extend(file_issues["高危"])
+            critical_issues["预警"].extend(file_issues["预警"])
+            total_count += file_count
             pbar.update(1)
     
-    print(f"✓ 共加载 {len(all_data)} 条分析数据")
+    print(f"✓ 共加载 {total_count} 条分析数据")
     
-    # 步骤3: 提取预警和高危问题
+    # 步骤3: 提取预警和高危问题（已在加载时完成筛选）
     update_main_progress("提取关键问题")
-    critical_issues = extract_critical_issues(all_data, show_progress=True)
-    
     print(f"✓ 提取完成: 高危 {len(critical_issues['高危'])} 个, 预警 {len(critical_issues['预警'])} 个")
     
     if len(critical_issues['高危']) == 0 and len(critical_issues['预警']) == 0:
@@ -656,14 +1043,16 @@ def main():
     
     # 步骤6: 生成综合解决方案
     update_main_progress("生成综合解决方案")
-    solutions = generate_solutions(critical_issues, method_content, platform)
+    solutions = asyncio.run(
+        generate_solutions_concurrently([(platform, critical_issues)], method_content, run_ts=run_ts)
+    )[0]
     
     # 保存解决方案到solution目录
     if solutions and "error" not in solutions:
         print("\n" + "="*80)
         print("保存解决方案".center(80))
         print("="*80)
-        output_file = save_solutions(solutions, output_dir="solution")
+        output_file = save_solutions(solutions, output_dir="solution", run_ts=run_ts)
         print(f"\n{'='*80}")
         print("✓ 任务完成！".center(80))
         print(f"{'='*80}")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应本地缓存
+以 模型名称+提示词 的哈希作为键，将解析后的JSON结果保存到SQLite，
+相同输入重复运行时直接返回缓存结果，跳过API调用；
+另可按"输入特征集合"做近似匹配，输入只有少量变化时复用已有结果；
+分析结果文件的筛选结果按 (路径, 大小, 修改时间, 筛选规则版本) 缓存，文件和筛选规则都未变化时跳过重新解析
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# ==================== 配置 ====================
+CACHE_FILE = ".llm_cache.sqlite3"
+CACHE_TTL_SECONDS = 7 * 24 * 3600  # 缓存有效期：7天
+SIMILARITY_THRESHOLD = 0.95  # 近似匹配的最低相似度（特征集合的Jaccard系数）
+
+# ==================== 缓存键 ====================
+def make_cache_key(model_name: str, prompt: str) -> str:
+    """根据模型名称和提示词生成缓存键"""
+    
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(model_name.encode('utf-8'))
+    digest.update(b'|')
+    digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()
+
+# ==================== 读写缓存 ====================
+def _connect(cache_file: str) -> sqlite3.Connection:
+    """打开缓存数据库，必要时建表"""
+    
+    conn = sqlite3.connect(cache_file)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, ts REAL NOT NULL, json TEXT NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS signatures ("
+        "key TEXT PRIMARY KEY, context TEXT NOT NULL, signature TEXT NOT NULL)"
+    )
+    # 旧版file_extracts表没有version列，其中的结果无法判断筛选规则版本，直接丢弃重建
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(file_extracts)")}
+    if columns and "version" not in columns:
+        with conn:
+            conn.execute("DROP TABLE file_extracts")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS file_extracts ("
+        "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "version INTEGER NOT NULL, json TEXT NOT NULL)"
+    )
+    return conn
+
+def cache_get(key: str, cache_file: str = CACHE_FILE, ttl: float = CACHE_TTL_SECONDS) -> Optional[Dict]:
+    """读取未过期的缓存结果，不存在、已过期或读取失败时返回None"""
+    
+    try:
+        conn = _connect(cache_file)
+        try:
+            row = conn.execute("SELECT ts, json FROM responses WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  读取缓存失败: {e}")
+        return None
+    
+    if row is None or time.time() - row[0] > ttl:
+        return None
+    
+    try:
+        return json.loads(row[1])
+    except json.JSONDecodeError:
+        return None
+
+def cache_put(key: str, value: Dict, cache_file: str = CACHE_FILE,
+              context: Optional[str] = None, signature: Optional[List[str]] = None):
+    """
+    写入缓存结果（写入失败只打印警告，不影响主流程）
+    同时提供context和signature时，记录特征集合以供cache_find_similar近似匹配
+    """
+    
+    try:
+        conn = _connect(cache_file)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, ts, json) VALUES (?, ?, ?)",
+                    (key, time.time(), json.dumps(value, ensure_ascii=False))
+                )
+                if context is not None and signature is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO signatures (key, context, signature) VALUES (?, ?, ?)",
+                        (key, context, json.dumps(sorted(set(signature)), ensure_ascii=False))
+                    )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  写入缓存失败: {e}")
+
+# ==================== 近似匹配 ====================
+def cache_find_similar(context: str, signature: List[str], cache_file: str = CACHE_FILE,
+                       threshold: float = SIMILARITY_THRESHOLD,
+                       ttl: float = CACHE_TTL_SECONDS) -> Optional[Dict]:
+    """
+    在context相同的缓存条目中查找特征集合最相似的一条
+    相似度（Jaccard系数）不低于threshold时返回其结果，否则返回None
+    """
+    
+    current = set(signature)
+    if not current:
+        return None
+    
+    try:
+        conn = _connect(cache_file)
+        try:
+            rows = conn.execute(
+                "SELECT s.signature, r.json FROM signatures s JOIN responses r ON r.key = s.key "
+                "WHERE s.context = ? AND r.ts >= ?",
+                (context, time.time() - ttl)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  读取缓存失败: {e}")
+        return None
+    
+    best_score, best_json = 0.0, None
+    for signature_json, result_json in rows:
+        stored = set(json.loads(signature_json))
+        score = len(current & stored) / len(current | stored)
+        if score > best_score:
+            best_score, best_json = score, result_json
+    
+    if best_json is None or best_score < threshold:
+        return None
+    
+    try:
+        return json.loads(best_json)
+    except json.JSONDecodeError:
+        return None
+
+# ==================== 文件筛选结果缓存 ====================
+def file_extract_get(file_path: str, size: int, mtime_ns: int, version: int,
+                     cache_file: str = CACHE_FILE) -> Optional[Dict]:
+    """读取文件的筛选结果缓存，文件大小、修改时间或筛选规则版本不一致时返回None"""
+    
+    try:
+        conn = _connect(cache_file)
+        try:
+            row = conn.execute(
+                "SELECT json FROM file_extracts WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                (file_path, size, mtime_ns, version)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  读取缓存失败: {e}")
+        return None
+    
+    if row is None:
+        return None
+    
+    try:
+        return json.loads(row[0])
+    except json.JSONDecodeError:
+        return None
+
+def file_extract_put(file_path: str, size: int, mtime_ns: int, version: int, value: Dict,
+                     cache_file: str = CACHE_FILE):
+    """写入文件的筛选结果缓存（每个路径只保留最新一条，写入失败只打印警告）"""
+    
+    try:
+        conn = _connect(cache_file)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO file_extracts (path, size, mtime_ns, version, json) VALUES (?, ?, ?, ?, ?)",
+                    (file_path, size, mtime_ns, version, json.dumps(value, ensure_ascii=False))
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️  写入缓存失败: {e}")